@@ -0,0 +1,139 @@
+import io, threading, time
+from picamera2 import Picamera2
+
+
+_tj = None  # TurboJPEG instance, created on first use (False if unavailable)
+
+def _turbojpeg():
+    global _tj
+    if _tj is None:
+        try:
+            from turbojpeg import TurboJPEG
+            _tj = TurboJPEG()
+        except (ImportError, OSError, RuntimeError):
+            # PyTurboJPEG or libjpeg-turbo not installed
+            _tj = False
+    return _tj
+
+
+def capture_jpeg_bytes(cam: Picamera2, quality: int = 85) -> bytes:
+    """
+    Software path: encode the current frame on the CPU.
+    Uses libjpeg-turbo (SIMD) straight from the capture array when
+    PyTurboJPEG is installed, else picamera2's file encoder.
+    """
+    tj = _turbojpeg()
+    if tj:
+        from turbojpeg import TJPF_RGB, TJPF_RGBX
+        arr = cam.capture_array("main")
+        # picamera2 BGR888 is R,G,B in memory; XBGR8888 is R,G,B,X.
+        fmt = TJPF_RGBX if arr.shape[-1] == 4 else TJPF_RGB
+        return tj.encode(arr, quality=quality, pixel_format=fmt)
+
+    buf = io.BytesIO()
+    cam.capture_file(buf, format="jpeg")
+    return buf.getvalue()
+
+
+class _LatestFrame(io.BufferedIOBase):
+    """FileOutput sink that keeps only the most recent encoded frame."""
+    def __init__(self):
+        self.frame = None
+        self.cond = threading.Condition()
+
+    def write(self, buf):
+        with self.cond:
+            self.frame = bytes(buf)
+            self.cond.notify_all()
+        return len(buf)
+
+
+class MJPEGFrameSource:
+    """
+    Hardware JPEG path: picamera2's MJPEGEncoder runs on the Pi's V4L2
+    (VideoCore) encoder, so DCT/quantization/Huffman cost no CPU time.
+    Call the instance to get the newest JPEG as bytes.
+
+    Notes:
+      - The camera must use a video configuration.
+      - quality is 1-100 (like libjpeg) and is bucketed onto picamera2's
+        Quality levels (VERY_LOW..VERY_HIGH); lower quality means smaller
+        frames and faster uploads.
+      - Pi 5 has no hardware JPEG block; use capture_jpeg_bytes there.
+    """
+    def __init__(self, cam: Picamera2, quality: int = 80):
+        from picamera2.encoders import MJPEGEncoder, Quality
+        from picamera2.outputs import FileOutput
+
+        levels = (Quality.VERY_LOW, Quality.LOW, Quality.MEDIUM, Quality.HIGH, Quality.VERY_HIGH)
+        self.cam = cam
+        self._sink = _LatestFrame()
+        self.encoder = MJPEGEncoder()
+        cam.start_recording(
+            self.encoder,
+            FileOutput(self._sink),
+            quality=levels[min(4, max(0, (int(quality) - 1) // 20))],
+        )
+
+    def __call__(self, timeout_s: float = 2.0) -> bytes:
+        with self._sink.cond:
+            # Bounded so a stalled encoder fails loudly instead of hanging the loop.
+            if not self._sink.cond.wait_for(lambda: self._sink.frame is not None, timeout_s):
+                raise TimeoutError(f"MJPEG encoder produced no frame within {timeout_s}s")
+            return self._sink.frame
+
+    def stop(self):
+        self.cam.stop_recording()
+
+
+def average_hash(jpeg: bytes) -> int:
+    """64-bit average hash of a JPEG (8x8 grayscale, bit = pixel > mean)."""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(jpeg))
+    img.draft("L", (64, 64))  # let the JPEG decoder downscale via DCT
+    px = list(img.convert("L").resize((8, 8)).getdata())
+    mean = sum(px) / 64
+    h = 0
+    for p in px:
+        h = (h << 1) | (p > mean)
+    return h
+
+
+class PrevFrameCache:
+    """
+    Reuse the last decision while the scene is unchanged.
+
+    lookup(jpeg) returns the previous Command if the frame's average hash is
+    fewer than max_bits from the frame that produced it and that decision is
+    younger than max_age_s (so a stuck cache expires); otherwise None. After a
+    miss, store(cmd) records the decision for that frame; store(None) forgets
+    the previous one.
+    """
+    def __init__(self, max_bits: int = 4, max_age_s: float = 2.0):
+        self.max_bits = max_bits
+        self.max_age_s = max_age_s
+        self._hash = None
+        self._pending = None
+        self._cmd = None
+        self._t = 0.0
+
+    def lookup(self, jpeg: bytes):
+        h = average_hash(jpeg)
+        if (
+            self._hash is not None
+            and time.monotonic() - self._t < self.max_age_s
+            and bin(h ^ self._hash).count("1") < self.max_bits
+        ):
+            return self._cmd
+        self._pending = h
+        return None
+
+    def store(self, cmd) -> None:
+        if self._pending is None:
+            return
+        if cmd is None:
+            self._hash = self._cmd = None
+        else:
+            self._hash, self._cmd, self._t = self._pending, cmd, time.monotonic()
+        self._pending = None
@@ -1,12 +1,22 @@
-import os, asyncio, time, base64
+import os, asyncio, time, functools, queue, hashlib, random, inspect, json, re, socket, logging, threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Literal
 
 from google import genai
 from google.genai import types, errors as genai_errors
 
+import httpx
 import websockets
 
+log = logging.getLogger("gemo")
+
+# Hot-path SDK constructors bound once (saves module attribute lookups per frame).
+_Part = types.Part
+_PartFromBytes = types.Part.from_bytes
+_Blob = types.Blob
+_FuncResp = types.FunctionResponse
+
 Drive = Literal["FORWARD", "STOP", "REVERSE"]
 Steer = Literal["LEFT", "CENTER", "RIGHT"]
 
@@ -16,19 +26,32 @@ class Command:
     steer: Steer = "CENTER"
     reason: str = ""
 
+# ---- output schema (batch JSON mode; also the tool's parameters) ----
+RC_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "drive": {"type": "string", "enum": ["FORWARD","STOP","REVERSE"]},
+        "steer": {"type": "string", "enum": ["LEFT","CENTER","RIGHT"]},
+        "reason": {"type": "string"},
+    },
+    "required": ["drive","steer"]
+}
+
+# Coalesced batch: one object per image, tagged with the image index.
+RC_SCHEMA_MULTI = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"image": {"type": "integer"}, **RC_SCHEMA["properties"]},
+        "required": ["image","drive","steer"]
+    }
+}
+
 # ---- tool schema ----
 TOOLS_DECL = types.Tool(function_declarations=[{
     "name": "set_rc_controls",
     "description": "Return RC car control commands.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "drive": {"type": "string", "enum": ["FORWARD","STOP","REVERSE"]},
-            "steer": {"type": "string", "enum": ["LEFT","CENTER","RIGHT"]},
-            "reason": {"type": "string"},
-        },
-        "required": ["drive","steer"]
-    }
+    "parameters": RC_SCHEMA,
 }])
 
 BASE_PROMPT_DEFAULT = (
@@ -41,15 +64,41 @@ BASE_PROMPT_DEFAULT = (
     "The reason must be a short noun phrase, no punctuation."
 )
 
+BATCH_PROMPT_DEFAULT = (
+    "You are an autonomous RC car controller. "
+    "Analyze the front camera image and decide the safest drive/steer. "
+    "If uncertain, choose STOP and CENTER. "
+    "Respond only with the JSON object fields drive, steer and reason. "
+    "The reason must be a short noun phrase, no punctuation."
+)
+
+@functools.lru_cache(maxsize=8)
 def make_silence_pcm16(rate: int = 16000, duration_s: float = 0.10) -> bytes:
-    """16-bit PCM mono silence, little-endian."""
+    """16-bit PCM mono silence, little-endian. Cached: bytes are immutable."""
     samples = int(rate * duration_s)
     return b"\x00\x00" * samples
 
+# Default 16kHz/100ms silence, built once for the live send path.
+_SILENCE_16K_100MS = make_silence_pcm16(rate=16000, duration_s=0.10)
+_SILENCE_BLOB = types.Blob(data=_SILENCE_16K_100MS, mime_type="audio/pcm;rate=16000")
+
+def _shrink_jpeg(jpeg: bytes, max_edge: int = 768, quality: int = 80) -> bytes:
+    """Downscale/re-encode a JPEG so its longest edge is <= max_edge."""
+    from io import BytesIO
+    from PIL import Image
+
+    img = Image.open(BytesIO(jpeg))
+    img.thumbnail((max_edge, max_edge))
+    buf = BytesIO()
+    img.save(buf, "JPEG", quality=quality, optimize=False)
+    return buf.getvalue()
+
+@functools.lru_cache(maxsize=1)
 def make_client():
     """
     - Dev API: GEMINI_API_KEY
     - Vertex: VERTEX_PROJECT + VERTEX_LOCATION
+    Cached: one client (and its HTTP connection pool) per process.
     """
     project = os.getenv("VERTEX_PROJECT")
     location = os.getenv("VERTEX_LOCATION")
@@ -57,163 +106,575 @@ def make_client():
         return genai.Client(vertexai=True, project=project, location=location)
     return genai.Client(http_options={"api_version": "v1beta"})
 
+_DRIVES = frozenset(RC_SCHEMA["properties"]["drive"]["enum"])
+_STEERS = frozenset(RC_SCHEMA["properties"]["steer"]["enum"])
+
+@functools.lru_cache(maxsize=16)
+def _cmd_base(drive: str, steer: str) -> Command:
+    """Validated reason-less Command; one shared instance per (drive, steer)."""
+    return Command(
+        drive=drive if drive in _DRIVES else "STOP",
+        steer=steer if steer in _STEERS else "CENTER",
+    )
+
 def _sanitize(drive: str, steer: str, reason: str = "") -> Command:
-    if drive not in ("FORWARD","STOP","REVERSE"):
+    # Non-string values (e.g. from repaired JSON) are unhashable/invalid: use defaults.
+    if not isinstance(drive, str):
         drive = "STOP"
-    if steer not in ("LEFT","CENTER","RIGHT"):
+    if not isinstance(steer, str):
         steer = "CENTER"
-    return Command(drive=drive, steer=steer, reason=reason or "")
+    base = _cmd_base(drive, steer)
+    if not reason:
+        return base
+    return Command(drive=base.drive, steer=base.steer, reason=reason)
+
+def _sanitize_fast(args) -> Command:
+    """
+    Tool-call path only: the server enforces the set_rc_controls enums,
+    so drive/steer go straight to the cached _cmd_base. Use _sanitize for
+    anything unvalidated.
+    """
+    get = args.get
+    base = _cmd_base(get("drive") or "STOP", get("steer") or "CENTER")
+    reason = get("reason")
+    if not reason:
+        return base
+    return Command(drive=base.drive, steer=base.steer, reason=reason[:64])
     
 # -------------------------
 # Batch (generate_content) : gemini-3-flash-preview / gemini-3-pro-preview / robotics-er
 # -------------------------
-def decide_batch(
-    client: genai.Client,
-    model: str,
-    jpeg: bytes,
-    base_prompt: str = BASE_PROMPT_DEFAULT,
-    max_retries: int = 2,
-    retry_delay_s: float = 0.4,
-) -> Command:
+@functools.lru_cache(maxsize=4)
+def _batch_cfg(model: str, multi: bool = False) -> types.GenerateContentConfig:
+    """Per-model GenerateContentConfig, built once and shared across calls."""
     if model == "gemini-3-pro-preview":
         thinking_cfg = types.ThinkingConfig(thinking_budget=128)
     else:
         thinking_cfg = types.ThinkingConfig(thinking_budget=0)
 
-    cfg = types.GenerateContentConfig(
-        tools=[TOOLS_DECL],
+    # Constrained JSON output, no tool-call framing.
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=RC_SCHEMA_MULTI if multi else RC_SCHEMA,
         temperature=0.2,
         thinking_config=thinking_cfg,
     )
 
-    resp = None
+# Transient failures worth a retry; bugs (TypeError, KeyError, ...) fail fast.
+# Of the 4xx ClientErrors only 429 (rate limit) is transient; 400/401/403/404 are raised.
+_BATCH_RETRYABLE = (
+    genai_errors.ServerError,
+    genai_errors.ClientError,
+    httpx.TransportError,
+)
+
+# In-process decision cache: (model, prompt, JPEG fingerprint) -> Command (LRU).
+_decision_cache: "OrderedDict[tuple, Command]" = OrderedDict()
+_DECISION_CACHE_MAX = 128
+_decision_lock = threading.Lock()  # coalesced flushes run decide_batch on executor threads
+
+def _frame_key(jpeg: bytes) -> bytes:
+    return hashlib.blake2b(jpeg, digest_size=8).digest()
+
+def _loads_tolerant(text: str):
+    """
+    json.loads, retried once with trailing commas stripped and open
+    strings/brackets/braces closed in nesting order.
+    Returns (data, repaired); repaired output may be missing fields.
+    """
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+    fixed = text.strip()
+    closers, in_str, esc = [], False, False
+    for ch in fixed:
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]" and closers:
+            closers.pop()
+    if in_str:
+        fixed += '"'
+    fixed = fixed.rstrip(", \n")
+    fixed += "".join(reversed(closers))
+    fixed = re.sub(r",\s*([}\]])", r"\1", fixed)
+    try:
+        return json.loads(fixed), True
+    except ValueError:
+        return None, True
+
+def _complete_repair(data: dict) -> bool:
+    return data.get("drive") in _DRIVES and data.get("steer") in _STEERS
+
+def _stream_json(stream):
+    """Read a JSON response stream, stopping as soon as the object is complete; returns (data, repaired)."""
+    text = ""
+    try:
+        for chunk in stream:
+            text += chunk.text or ""
+            if text.rstrip().endswith("}"):
+                try:
+                    return json.loads(text), False
+                except ValueError:
+                    continue
+        return _loads_tolerant(text)
+    finally:
+        stream.close()
+
+def decide_batch(
+    client: genai.Client,
+    model: str,
+    jpeg: bytes,
+    base_prompt: str = BATCH_PROMPT_DEFAULT,
+    max_retries: int = 2,
+    retry_delay_s: float = 0.4,
+    use_cache: bool = True,
+    shrink_over_bytes: int = 120_000,
+    shrink_quality: int = 80,
+) -> Command:
+    key = None
+    if use_cache:
+        key = (model, base_prompt, _frame_key(jpeg))
+        with _decision_lock:
+            cached = _decision_cache.get(key)
+            if cached is not None:
+                _decision_cache.move_to_end(key)
+                return cached
+
+    # Gemini downsamples anyway; big frames only cost upload time.
+    if len(jpeg) > shrink_over_bytes:
+        jpeg = _shrink_jpeg(jpeg, quality=shrink_quality)
+
+    cfg = _batch_cfg(model)
+
+    data, repaired = None, False
     for attempt in range(max_retries + 1):
         try:
-            resp = client.models.generate_content(
+            # Stream so the decision is returned as soon as the JSON object closes.
+            data, repaired = _stream_json(client.models.generate_content_stream(
                 model=model,
                 contents=[
-                    types.Part(text=base_prompt),
-                    types.Part.from_bytes(data=jpeg, mime_type="image/jpeg"),
+                    _Part(text=base_prompt),
+                    _PartFromBytes(data=jpeg, mime_type="image/jpeg"),
                 ],
                 config=cfg,
-            )
+            ))
             break
-        except (genai_errors.ServerError, genai_errors.APIError, Exception) as e:
+        except _BATCH_RETRYABLE as e:
+            if isinstance(e, genai_errors.ClientError) and e.code != 429:
+                raise
             if attempt >= max_retries:
                 print(f"[BATCH] generate_content failed: {type(e).__name__}: {e}")
                 return Command()
             time.sleep(retry_delay_s * (2 ** attempt))
 
-    try:
-        if resp is None:
-            return Command()
-        parts = resp.candidates[0].content.parts
-        fc = next((p.function_call for p in parts if getattr(p, "function_call", None)), None)
-        if not fc or fc.name != "set_rc_controls":
-            return Command()
-        args = fc.args or {}
-        return _sanitize(args.get("drive","STOP"), args.get("steer","CENTER"), args.get("reason",""))
-    except Exception:
+    if not isinstance(data, dict):
+        return Command()
+    # Repaired JSON is not schema-checked: a truncated object that lost drive/steer,
+    # or cut one mid-value ("RIG"), must not turn into a command.
+    if repaired and not _complete_repair(data):
         return Command()
+    cmd = _sanitize(data.get("drive","STOP"), data.get("steer","CENTER"), str(data.get("reason") or "")[:64])
+
+    if key is not None and not repaired:
+        with _decision_lock:
+            _decision_cache[key] = cmd
+            _decision_cache.move_to_end(key)
+            if len(_decision_cache) > _DECISION_CACHE_MAX:
+                _decision_cache.popitem(last=False)
+    return cmd
         
+# -------------------------
+# Coalesced batch: concurrent callers share one generate_content call
+# -------------------------
+_coalesce_pending: dict = {}
+_coalesce_tasks: set = set()  # strong refs so flush tasks are not GC'd mid-flight
+
+async def _decide_multi(
+    client: genai.Client,
+    model: str,
+    jpegs: list,
+    base_prompt: str,
+    max_retries: int,
+    retry_delay_s: float,
+    shrink_over_bytes: int,
+    shrink_quality: int,
+) -> list:
+    # Same gate as decide_batch; off the loop thread since PIL re-encoding is CPU work.
+    loop = asyncio.get_running_loop()
+    shrink = functools.partial(_shrink_jpeg, quality=shrink_quality)
+    jpegs = [
+        await loop.run_in_executor(None, shrink, jpeg) if len(jpeg) > shrink_over_bytes else jpeg
+        for jpeg in jpegs
+    ]
+    contents = [_Part(text=(
+        f"{base_prompt} There are {len(jpegs)} images. "
+        "Return a JSON array with one object per image, setting image to its index."
+    ))]
+    for i, jpeg in enumerate(jpegs):
+        contents.append(_Part(text=f"image {i}:"))
+        contents.append(_PartFromBytes(data=jpeg, mime_type="image/jpeg"))
+
+    resp = None
+    for attempt in range(max_retries + 1):
+        try:
+            resp = await client.aio.models.generate_content(
+                model=model, contents=contents, config=_batch_cfg(model, multi=True),
+            )
+            break
+        except _BATCH_RETRYABLE as e:
+            if isinstance(e, genai_errors.ClientError) and e.code != 429:
+                raise
+            if attempt >= max_retries:
+                print(f"[BATCH] coalesced generate_content failed: {type(e).__name__}: {e}")
+                return [Command()] * len(jpegs)
+            await asyncio.sleep(retry_delay_s * (2 ** attempt))
+
+    cmds = [Command()] * len(jpegs)
+    items, repaired = _loads_tolerant(resp.text or "")
+    if not isinstance(items, list):
+        return cmds
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        if repaired and not _complete_repair(item):
+            continue
+        try:
+            i = int(item.get("image", -1))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= i < len(cmds):
+            cmds[i] = _sanitize(item.get("drive","STOP"), item.get("steer","CENTER"), str(item.get("reason") or "")[:64])
+    return cmds
+
+async def _flush_coalesced(client, model, base_prompt, batch, max_retries, retry_delay_s, shrink_over_bytes, shrink_quality):
+    try:
+        if len(batch) == 1:
+            # Only one request in flight: plain decide_batch, no multi-image prompt.
+            jpeg, _ = batch[0]
+            cmds = [await asyncio.get_running_loop().run_in_executor(
+                None, decide_batch, client, model, jpeg, base_prompt, max_retries, retry_delay_s,
+                True, shrink_over_bytes, shrink_quality,
+            )]
+        else:
+            cmds = await _decide_multi(
+                client, model, [jpeg for jpeg, _ in batch], base_prompt, max_retries, retry_delay_s,
+                shrink_over_bytes, shrink_quality,
+            )
+    except Exception as e:
+        # Hand the error to the waiting callers instead of leaving them hanging.
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(e)
+        return
+    for (_, fut), cmd in zip(batch, cmds):
+        if not fut.done():
+            fut.set_result(cmd)
+
+def _drain_coalesced(pending, client, model, base_prompt, max_batch, *flush_args):
+    while pending:
+        batch = pending[:max_batch]
+        del pending[:max_batch]
+        task = asyncio.create_task(_flush_coalesced(
+            client, model, base_prompt, batch, *flush_args,
+        ))
+        _coalesce_tasks.add(task)
+        task.add_done_callback(_coalesce_tasks.discard)
+
+async def decide_batch_coalesced(
+    client: genai.Client,
+    model: str,
+    jpeg: bytes,
+    base_prompt: str = BATCH_PROMPT_DEFAULT,
+    window_s: float = 5e-3,
+    max_batch: int = 8,
+    max_retries: int = 2,
+    retry_delay_s: float = 0.4,
+    shrink_over_bytes: int = 120_000,
+    shrink_quality: int = 80,
+) -> Command:
+    """
+    Async decide_batch for concurrent callers (multiple cars/cameras).
+    Requests arriving within window_s are sent as one multi-image call
+    (at most max_batch images each) and the results fanned back by index.
+    """
+    # All access happens on the event loop thread, so the list needs no lock.
+    key = (id(client), model, base_prompt, shrink_over_bytes, shrink_quality)
+    pending = _coalesce_pending.setdefault(key, [])
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    pending.append((jpeg, fut))
+
+    if len(pending) == 1:
+        # First caller in the window schedules the flush. A loop timer rather than
+        # sleeping here, so cancelling that caller cannot strand the others.
+        loop.call_later(
+            window_s, _drain_coalesced,
+            pending, client, model, base_prompt, max_batch,
+            max_retries, retry_delay_s, shrink_over_bytes, shrink_quality,
+        )
+    return await fut
+
 # -------------------------
 # Live (WebSocket session) : gemini-2.5-flash-native-audio-preview-12-2025
 # -------------------------
-async def _wait_toolcall(session, timeout_s: float = 6.0, debug: bool = False) -> Command:
-    async def wait_toolcall() -> Command:
-        async for msg in session.receive():
-            # if debug:
-            #     print(
-            #         f"[LIVE] msg: tool_call={bool(getattr(msg, 'tool_call', None))} "
-            #         f"data={bool(getattr(msg, 'data', None))} "
-            #         f"text={bool(getattr(msg, 'text', None))}"
-            #     )
-            if msg.tool_call:
-                for fc in msg.tool_call.function_calls:
-                    if fc.name != "set_rc_controls":
-                        continue
-
-                    args = fc.args or {}
-                    cmd = _sanitize(
-                        args.get("drive", "STOP"),
-                        args.get("steer", "CENTER"),
-                        args.get("reason", ""),
-                    )
-
-                    # Live API: tool response is required.
-                    await session.send_tool_response(function_responses=[
-                        types.FunctionResponse(id=fc.id, name=fc.name, response={"result": "ok"})
-                    ])
-                    return cmd
-        return Command(reason="no_tool_call")
 
+@functools.lru_cache(maxsize=4)
+def _live_cfg(model: str) -> types.LiveConnectConfig:
+    """Per-model LiveConnectConfig, built once and shared across sessions."""
+    # Only tool_calls are consumed, so TEXT is preferred: no server-side speech
+    # synthesis and no audio frames on the wire.
+    if "native-audio" not in model:
+        return types.LiveConnectConfig(
+            response_modalities=["TEXT"],
+            tools=[{"function_declarations": TOOLS_DECL.function_declarations}],
+        )
+    # native-audio models require AUDIO modality; ask them to stay silent, and the
+    # receiver never decodes audio parts (it only reads tool_call/turn_complete).
+    return types.LiveConnectConfig(
+        response_modalities=["AUDIO"],
+        tools=[{"function_declarations": TOOLS_DECL.function_declarations}],
+        system_instruction="Never speak. Respond only by calling set_rc_controls.",
+    )
+
+# Disconnects and server-side failures are retried; anything else is a bug and propagates.
+# session.receive() re-raises websocket closes as genai APIError carrying the close code.
+_LIVE_RETRYABLE = (
+    websockets.exceptions.WebSocketException,
+    genai_errors.APIError,
+    OSError,
+)
+_LIVE_BACKOFF_MAX_S = 30.0
+_LIVE_BACKOFF_MAX_EXP = 10
+_LIVE_MAX_LAG_PERIODS = 3
+
+def _is_clean_close(e: BaseException) -> bool:
+    if isinstance(e, websockets.exceptions.ConnectionClosedOK):
+        return True
+    return isinstance(e, genai_errors.APIError) and e.code == 1000
+
+def _set_tcp_nodelay(session) -> None:
+    """Disable Nagle on the Live WebSocket; best effort across SDK/websockets versions."""
     try:
-        return await asyncio.wait_for(wait_toolcall(), timeout=timeout_s)
-    except asyncio.TimeoutError:
-        return Command(reason="timeout")
-    
+        sock = session._ws.transport.get_extra_info("socket")
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except Exception as e:
+        print(f"[LIVE] TCP_NODELAY not set: {type(e).__name__}: {e}")
+
+async def _next_frame(frame_provider):
+    """
+    Fetch a frame without blocking the event loop:
+    - async provider: awaited directly
+    - queue-like provider: drained to the newest frame (None if empty)
+    - plain callable: run in the default thread executor, one call at a
+      time, so it must be safe to call from a worker thread
+    """
+    if inspect.iscoroutinefunction(frame_provider):
+        return await frame_provider()
+    if hasattr(frame_provider, "get_nowait"):
+        jpeg = None
+        while True:
+            try:
+                jpeg = frame_provider.get_nowait()
+            except (queue.Empty, asyncio.QueueEmpty):
+                return jpeg
+    return await asyncio.get_running_loop().run_in_executor(None, frame_provider)
+
+# ---- pipeline stages: capture -> send, and receive, run concurrently ----
+async def _capture_frames(frame_provider, out_queue: asyncio.Queue, loop_delay_s: float,
+                          shrink_over_bytes: int, shrink_quality: int):
+    # Fixed cadence: the period does not stretch with capture/encode time.
+    next_t = time.monotonic()
+    while True:
+        jpeg = await _next_frame(frame_provider)
+        if jpeg is not None and len(jpeg) > shrink_over_bytes:
+            jpeg = await asyncio.get_running_loop().run_in_executor(
+                None, _shrink_jpeg, jpeg, 768, shrink_quality,
+            )
+        if jpeg is not None:
+            # Latest frame wins: replace a frame the sender has not picked up yet.
+            try:
+                out_queue.put_nowait(jpeg)
+            except asyncio.QueueFull:
+                out_queue.get_nowait()
+                out_queue.put_nowait(jpeg)
+        next_t += loop_delay_s
+        now = time.monotonic()
+        if now - next_t > _LIVE_MAX_LAG_PERIODS * loop_delay_s:
+            # Fell far behind: re-anchor instead of bursting to catch up.
+            next_t = now
+        await asyncio.sleep(max(0.0, next_t - now))
+
+async def _send_frames(session, out_queue: asyncio.Queue, base_prompt: str, send_audio: bool,
+                       repeat_frame_ttl_s: float, debug: bool = False):
+    last_key, last_sent = None, 0.0
+    while True:
+        jpeg = await out_queue.get()
+        # Identical frame sent moments ago: its decision still stands.
+        key = _frame_key(jpeg)
+        now = time.monotonic()
+        if key == last_key and now - last_sent < repeat_frame_ttl_s:
+            continue
+        last_key, last_sent = key, now
+        if debug:
+            log.info("[LIVE] frame_bytes=%d", len(jpeg))
+
+        # Raw bytes: the SDK serializes the Blob itself.
+        video = session.send_realtime_input(
+            video=_Blob(data=jpeg, mime_type="image/jpeg")
+        )
+        if send_audio:
+            # send_realtime_input takes one input per call; issue both writes together.
+            await asyncio.gather(
+                session.send_realtime_input(audio=_SILENCE_BLOB),
+                video,
+            )
+        else:
+            await video
+        await session.send_client_content(
+            turns={"parts": [{"text": base_prompt}]},
+            turn_complete=True,
+        )
+
+async def _dispatch_command(on_command, cmd: Command):
+    # Async handlers are awaited; sync ones may block (GPIO pulses sleep),
+    # so they run in a worker thread instead of on the event loop.
+    if inspect.iscoroutinefunction(on_command):
+        await on_command(cmd)
+    else:
+        await asyncio.get_running_loop().run_in_executor(None, on_command, cmd)
+
+async def _receive_commands(session, on_command, stall_timeout_s: float = 6.0, on_tool_call=None):
+    loop = asyncio.get_running_loop()
+    saw_call = False
+    while True:
+        try:
+            # One timeout context, pushed forward on every message; cheaper than a
+            # wait_for() wrapper task per receive.
+            async with asyncio.timeout(stall_timeout_s) as deadline:
+                # receive() ends at each turn boundary; keep draining every turn.
+                while True:
+                    async for msg in session.receive():
+                        deadline.reschedule(loop.time() + stall_timeout_s)
+                        if not msg.tool_call:
+                            # Turn ended without a tool call (schema miss): fall back now
+                            # rather than leaving the last command in effect.
+                            sc = msg.server_content
+                            if sc and sc.turn_complete:
+                                if not saw_call:
+                                    await _dispatch_command(on_command, Command(reason="no_tool_call"))
+                                saw_call = False
+                            continue
+                        saw_call = True
+                        if on_tool_call:
+                            on_tool_call()
+                        # Calls are answered in arrival (FIFO) order, matched by fc.id.
+                        cmds, responses = [], []
+                        for fc in msg.tool_call.function_calls:
+                            if fc.name != "set_rc_controls":
+                                continue
+                            args = fc.args or {}
+                            cmds.append(_sanitize_fast(args))
+                            responses.append(_FuncResp(
+                                id=fc.id, name=fc.name, response={"result": "ok"}
+                            ))
+                        # Live API: tool response is required. Ack first so the server is not
+                        # kept waiting on the GPIO pulse.
+                        if responses:
+                            await session.send_tool_response(function_responses=responses)
+                        for cmd in cmds:
+                            await _dispatch_command(on_command, cmd)
+        except TimeoutError:
+            # Server silent for stall_timeout_s: fall back to defaults and keep listening.
+            await _dispatch_command(on_command, Command(reason="timeout"))
+
 # =========================
 # Public Live-loop wrapper
 # =========================
 async def run_live_loop(
     model: str,
-    frame_provider,      # callable -> jpeg bytes
-    on_command,          # callable(Command) -> None
+    frame_provider,      # (async) callable -> jpeg bytes, or queue of jpeg bytes
+    on_command,          # async callable(Command), or sync (run in a worker thread)
     base_prompt: str = BASE_PROMPT_DEFAULT,
     loop_delay_s: float = 0.2,
+    repeat_frame_ttl_s: float = 1.0,
+    send_audio: bool = False,
+    shrink_over_bytes: int = 120_000,
+    shrink_quality: int = 80,
+    stall_timeout_s: float = 6.0,
 ):
-    client = make_client()
+    """
+    Pipelined Live loop: capture, send and receive run as separate tasks so
+    several frames can be in flight while tool_calls for earlier ones arrive.
 
-    # native-audio models require AUDIO modality.
-    response_modalities = ["AUDIO"] if "native-audio" in model else ["TEXT"]
-    config = types.LiveConnectConfig(
-        response_modalities=response_modalities,
-        tools=[{"function_declarations": TOOLS_DECL.function_declarations}],
-    )
-    send_audio = "AUDIO" in response_modalities
+    send_audio: native-audio models run with AUDIO modality and may need a
+    short silence chunk per frame; opt in with send_audio=True. It is
+    ignored for TEXT sessions.
+    """
+    client = make_client()
+    config = _live_cfg(model)
+    send_audio = send_audio and "AUDIO" in config.response_modalities
     debug_frames = True
 
+    attempt = 0
+    def reset_backoff():
+        # A tool_call proves the session works end to end, not just the handshake.
+        nonlocal attempt
+        attempt = 0
+
     while True:
         try:
             live_model = model
             if "/" not in live_model:
                 live_model = f"models/{live_model}"
             async with client.aio.live.connect(model=live_model, config=config) as session:
+                _set_tcp_nodelay(session)
                 await session.send_client_content(
                     turns={"parts": [{"text": base_prompt}]},
                     turn_complete=True,
                 )
                 await asyncio.sleep(0.2)
 
-                while True:
-                    jpeg = frame_provider()
-                    if debug_frames:
-                        print(f"[LIVE] frame_bytes={len(jpeg)}")
-
-                    if send_audio:
-                        silence = make_silence_pcm16(rate=16000, duration_s=0.10)
-                        await session.send_realtime_input(
-                            audio={"data": silence, "mime_type": "audio/pcm"}
-                        )
-
-                    b64 = base64.b64encode(jpeg).decode("utf-8")
-                    await session.send_realtime_input(
-                        media={"data": b64, "mime_type": "image/jpeg"}
-                    )
-                    await session.send_client_content(
-                        turns={"parts": [{"text": base_prompt}]},
-                        turn_complete=True,
-                    )
-
-                    # Timeout: if no tool_call arrives, return defaults and continue.
-                    cmd = await _wait_toolcall(session, debug=False)
-                    on_command(cmd)
-
-                    await asyncio.sleep(loop_delay_s)
-
-        except (websockets.exceptions.ConnectionClosedError,
-                websockets.exceptions.ConnectionClosedOK,
-                Exception) as e:
-            # If the connection drops or the server closes the session, pause and reconnect.
-            print(f"[LIVE] reconnecting due to: {type(e).__name__}: {e}")
-            await asyncio.sleep(1.0)
+                # Never buffer more than one frame ahead of the sender.
+                out_queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+                tasks = [
+                    asyncio.create_task(_capture_frames(
+                        frame_provider, out_queue, loop_delay_s, shrink_over_bytes, shrink_quality,
+                    )),
+                    asyncio.create_task(_send_frames(
+                        session, out_queue, base_prompt, send_audio, repeat_frame_ttl_s, debug_frames,
+                    )),
+                    asyncio.create_task(_receive_commands(
+                        session, on_command, stall_timeout_s, on_tool_call=reset_backoff,
+                    )),
+                ]
+                try:
+                    # Runs until one half fails (e.g. the socket closes); the others are cancelled.
+                    await asyncio.gather(*tasks)
+                finally:
+                    for t in tasks:
+                        t.cancel()
+
+        except _LIVE_RETRYABLE as e:
+            if _is_clean_close(e):
+                # Clean close (e.g. session time limit): reconnect promptly.
+                print(f"[LIVE] session closed ({e}); reconnecting")
+                await asyncio.sleep(1.0)
+                continue
+            # If the connection drops or the server closes the session, back off and reconnect.
+            # Capped exponential backoff with jitter keeps a fleet from reconnecting in lockstep.
+            delay = min(_LIVE_BACKOFF_MAX_S, random.uniform(0.2, 0.2 * (2 ** attempt)))
+            # Capped: the delay saturates at _LIVE_BACKOFF_MAX_S long before this, and an
+            # unbounded exponent would overflow float after hours of outage.
+            attempt = min(attempt + 1, _LIVE_BACKOFF_MAX_EXP)
+            print(f"[LIVE] reconnecting in {delay:.1f}s due to: {type(e).__name__}: {e}")
+            await asyncio.sleep(delay)
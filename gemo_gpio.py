@@ -1,4 +1,4 @@
-import time
+import time, asyncio
 from typing import Protocol
 from gpiozero import DigitalOutputDevice, PWMOutputDevice
 
@@ -43,6 +43,9 @@ class TB6612Channel:
       - VCC should be 3.3V from Raspberry Pi
       - VM is motor supply (e.g., 2S 7.4V)
       - GND must be common between Pi and motor supply
+      - hw_pwm=True drives pwm_pin from the BCM PWM peripheral via pigpio
+        (needs pigpiod running; only BCM12/13/18/19 have hardware PWM):
+        no CPU cost and no jitter on duty updates.
     """
 
     def __init__(
@@ -52,8 +55,20 @@ class TB6612Channel:
         in2_pin: int,
         stby,
         pwm_freq: int = 1000,
+        hw_pwm: bool = False,
     ):
-        self.pwm = PWMOutputDevice(pwm_pin, frequency=pwm_freq, initial_value=0.0)
+        self.pwm_pin = pwm_pin
+        self.pwm_freq = pwm_freq
+        self._pi = None
+        self.pwm = None
+        if hw_pwm:
+            import pigpio
+            self._pi = pigpio.pi()
+            if not self._pi.connected:
+                raise RuntimeError("pigpiod is not running (sudo systemctl start pigpiod)")
+            self._set_duty(0.0)
+        else:
+            self.pwm = PWMOutputDevice(pwm_pin, frequency=pwm_freq, initial_value=0.0)
         self.in1 = DigitalOutputDevice(in1_pin, initial_value=False)
         self.in2 = DigitalOutputDevice(in2_pin, initial_value=False)
         self.stby = stby
@@ -62,27 +77,34 @@ class TB6612Channel:
         # Some breakouts require STBY HIGH to run
         self.stby.on()
 
+    def _set_duty(self, speed: float):
+        if self._pi is not None:
+            # duty is in millionths
+            self._pi.hardware_PWM(self.pwm_pin, self.pwm_freq, int(speed * 1_000_000))
+        else:
+            self.pwm.value = speed
+
     def stop(self):
         # Coast/stop
-        self.pwm.value = 0.0
+        self._set_duty(0.0)
         self.in1.off(); self.in2.off()
 
     def forward(self, speed: float):
         speed = max(0.0, min(1.0, float(speed)))
         self._enable()
         self.in1.on(); self.in2.off()
-        self.pwm.value = speed
+        self._set_duty(speed)
 
     def reverse(self, speed: float):
         speed = max(0.0, min(1.0, float(speed)))
         self._enable()
         self.in1.off(); self.in2.on()
-        self.pwm.value = speed
+        self._set_duty(speed)
 
     def brake(self):
         # Active brake; PWM=0 with both inputs same
         self._enable()
-        self.pwm.value = 0.0
+        self._set_duty(0.0)
         self.in1.off(); self.in2.off()
 
 
@@ -120,6 +142,25 @@ class SteeringPulse:
         time.sleep(self.pulse_s)
         self.ch.stop()
 
+    # Async variants: same pulse, but the wait yields to the event loop.
+    async def _pulse_async(self, start, *args):
+        now = time.time()
+        if now - self._last < self.min_interval:
+            return
+        self._last = now
+        start(*args)
+        try:
+            await asyncio.sleep(self.pulse_s)
+        finally:
+            # Cancellation (e.g. live reconnect) must not leave the motor powered.
+            self.ch.stop()
+
+    async def left_async(self):
+        await self._pulse_async(self.ch.forward, self.power)
+
+    async def right_async(self):
+        await self._pulse_async(self.ch.reverse, self.power)
+
 
 class DrivePulse:
     """
@@ -153,3 +194,21 @@ class DrivePulse:
         self.ch.reverse(speed)
         time.sleep(self.pulse_s)
         self.ch.stop()
+
+    async def _pulse_async(self, start, *args):
+        now = time.time()
+        if now - self._last < self.min_interval:
+            return
+        self._last = now
+        start(*args)
+        try:
+            await asyncio.sleep(self.pulse_s)
+        finally:
+            # Cancellation (e.g. live reconnect) must not leave the motor powered.
+            self.ch.stop()
+
+    async def forward_async(self, speed: float):
+        await self._pulse_async(self.ch.forward, speed)
+
+    async def reverse_async(self, speed: float):
+        await self._pulse_async(self.ch.reverse, speed)
@@ -1,4 +1,5 @@
-import os, io, time, argparse, asyncio
+import os, sys, time, argparse, asyncio, logging, queue
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -6,6 +7,7 @@ from picamera2 import Picamera2
 from gpiozero import DigitalOutputDevice
 
 from gemo_gpio import TB6612Channel, SteeringPulse, DrivePulse
+from gemo_camera import capture_jpeg_bytes, MJPEGFrameSource, PrevFrameCache
 from gemo_gemini import make_client, decide_batch, run_live_loop, Command
 
 # ===== GPIO pins (BCM) =====
@@ -14,13 +16,37 @@ PWMA, AIN1, AIN2 = 18, 23, 24     # drive (A)
 PWMB, BIN1, BIN2 = 19, 27, 22     # steer (B)
 STBY = 25                         # standby (shared)
 
+log = logging.getLogger("gemo")
+
 DEFAULT_BATCH_MODEL = "gemini-3-flash-preview"
 DEFAULT_LIVE_MODEL  = "gemini-2.5-flash-native-audio-preview-09-2025"
 
-def capture_jpeg_bytes(cam: Picamera2) -> bytes:
-    buf = io.BytesIO()
-    cam.capture_file(buf, format="jpeg")
-    return buf.getvalue()
+def setup_logging() -> QueueListener:
+    """Loop logs go through a queue; a background thread does the stdout writes."""
+    q = queue.SimpleQueue()
+    listener = QueueListener(q, logging.StreamHandler(sys.stdout))
+    # Only our logger: the root logger and third-party libraries are left alone.
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    log.addHandler(QueueHandler(q))
+    listener.start()
+    return listener
+
+def parse_size(s: str) -> tuple:
+    w, h = s.lower().split("x")
+    return int(w), int(h)
+
+def is_idle_repeat(cmd: Command, last: Command) -> bool:
+    """
+    True when cmd and last are both STOP/CENTER: re-applying would only
+    rewrite the same GPIO state. Moving commands are pulses and must be
+    re-applied every time, so they never count as repeats.
+    """
+    return (
+        last is not None
+        and cmd.drive == last.drive == "STOP"
+        and cmd.steer == last.steer == "CENTER"
+    )
 
 def apply_cmd(cmd: Command, drive_ch: TB6612Channel, steer: SteeringPulse, drive_speed: float):
     steer_action = None
@@ -55,6 +81,43 @@ def apply_cmd(cmd: Command, drive_ch: TB6612Channel, steer: SteeringPulse, drive
     else:
         steer.center()
 
+async def apply_cmd_async(cmd: Command, drive_ch: TB6612Channel, steer: SteeringPulse, drive_speed: float):
+    """apply_cmd for the live loop: pulse waits are awaited, not time.sleep()."""
+    steer_action = None
+    if cmd.steer == "LEFT":
+        steer_action = steer.left_async
+    elif cmd.steer == "RIGHT":
+        steer_action = steer.right_async
+
+    if steer_action and cmd.drive in ("FORWARD", "REVERSE"):
+        try:
+            await steer_action()
+            if cmd.drive == "FORWARD":
+                drive_ch.ch.forward(drive_speed)
+            else:
+                drive_ch.ch.reverse(drive_speed)
+            t_end = time.time() + drive_ch.pulse_s
+            while time.time() < t_end:
+                await steer_action()
+                await asyncio.sleep(steer.min_interval)
+        finally:
+            # Also runs on cancellation, so the drive motor never stays on.
+            drive_ch.ch.stop()
+            steer.center()
+        return
+
+    if cmd.drive == "FORWARD":
+        await drive_ch.forward_async(drive_speed)
+    elif cmd.drive == "REVERSE":
+        await drive_ch.reverse_async(drive_speed)
+    else:
+        drive_ch.stop()
+
+    if steer_action:
+        await steer_action()
+    else:
+        steer.center()
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--mode", choices=["batch","live"], default="batch")
@@ -64,13 +127,18 @@ def main():
     ap.add_argument("--drive_pulse", type=float, default=0.50)
     ap.add_argument("--steer_pulse", type=float, default=0.10)
     ap.add_argument("--steer_power", type=float, default=0.80)
+    ap.add_argument("--jpeg_encoder", choices=["auto","sw","hw"], default="auto")
+    ap.add_argument("--jpeg_quality", type=int, default=80)
+    ap.add_argument("--capture_size", type=parse_size, default=(512, 288))
+    ap.add_argument("--similar_frame_bits", type=int, default=4)
+    ap.add_argument("--hw_pwm", action="store_true")
     args = ap.parse_args()
 
     if args.mode == "live":
-        # Live mode uses the native-audio preview model by default.
-        if args.model and args.model != DEFAULT_LIVE_MODEL:
-            print(f"[LIVE] overriding model {args.model} -> {DEFAULT_LIVE_MODEL}")
-        args.model = DEFAULT_LIVE_MODEL
+        # Live mode uses the native-audio preview model by default. Non-native-audio
+        # live models run with TEXT modality (tool calls only, no generated audio).
+        if args.model is None:
+            args.model = DEFAULT_LIVE_MODEL
         # Live video input is expected at ~1 FPS.
         if args.fps > 1.0:
             args.fps = 1.0
@@ -85,14 +153,36 @@ def main():
 
     # Camera
     cam = Picamera2()
-    cam.configure(cam.create_still_configuration(main={"size": (640, 360)}))
-    cam.start()
+    hw_source = None
+    if args.jpeg_encoder in ("auto", "hw"):
+        # Persistent hardware MJPEG encoder fed YUV420 straight from the ISP;
+        # recording starts the camera.
+        cam.configure(cam.create_video_configuration(
+            main={"size": args.capture_size, "format": "YUV420"}
+        ))
+        try:
+            hw_source = MJPEGFrameSource(cam, quality=args.jpeg_quality)
+        except Exception as e:
+            if args.jpeg_encoder == "hw":
+                raise
+            print(f"[CAM] hardware JPEG unavailable ({type(e).__name__}: {e}); using software")
+            cam.stop()  # no-op unless recording got as far as starting the camera
+    if hw_source is not None:
+        grab_jpeg = hw_source
+    else:
+        # Video configuration: no still-pipeline reconfiguration per capture.
+        cam.configure(cam.create_video_configuration(main={"size": args.capture_size}))
+        cam.options["quality"] = args.jpeg_quality  # picamera2 fallback encoder
+        cam.start()
+        grab_jpeg = lambda: capture_jpeg_bytes(cam, quality=args.jpeg_quality)
 
     # GPIO
     stby = DigitalOutputDevice(STBY, initial_value=True)
 
+    # PWMA is on BCM18 (hardware PWM0), so the drive channel can use pigpio hardware PWM.
     drive_raw = TB6612Channel(
-        pwm_pin=PWMA, in1_pin=AIN1, in2_pin=AIN2, stby=stby
+        pwm_pin=PWMA, in1_pin=AIN1, in2_pin=AIN2, stby=stby,
+        pwm_freq=20000 if args.hw_pwm else 1000, hw_pwm=args.hw_pwm,
     )
     drive_ch = DrivePulse(drive_raw, pulse_s=args.drive_pulse)
     steer_ch = TB6612Channel(
@@ -101,6 +191,9 @@ def main():
     steer = SteeringPulse(steer_ch, pulse_s=args.steer_pulse, power=args.steer_power)
 
     period = 1.0 / max(1.0, args.fps)
+    # Batch mode: near-identical frames (average-hash distance < bits) reuse the last
+    # STOP decision; <=0 disables.
+    frame_cache = PrevFrameCache(max_bits=args.similar_frame_bits) if args.similar_frame_bits > 0 else None
 
     def format_cmd_log(cmd: Command, dt_s: float) -> str:
         base = f"{cmd.drive}/{cmd.steer}"
@@ -110,39 +203,62 @@ def main():
         return base
 
     print(f"GEMO start | mode={args.mode} model={args.model}")
+    log_listener = setup_logging()
     try:
         if args.mode == "batch":
             client = make_client()
             last_print = time.monotonic()
+            last_cmd = None
             while True:
                 t0 = time.time()
-                jpeg = capture_jpeg_bytes(cam)
-                cmd = decide_batch(client, args.model, jpeg)
-                apply_cmd(cmd, drive_ch, steer, args.drive_speed)
+                jpeg = grab_jpeg()
+                cmd = frame_cache.lookup(jpeg) if frame_cache else None
+                if cmd is None:
+                    cmd = decide_batch(client, args.model, jpeg)
+                    if frame_cache:
+                        # Only idle decisions are replayed: a car creeping toward a wall
+                        # barely changes an 8x8 hash. Failures come back as a bare
+                        # Command(); never reuse one.
+                        frame_cache.store(cmd if cmd.drive == "STOP" and cmd != Command() else None)
+                if not is_idle_repeat(cmd, last_cmd):
+                    apply_cmd(cmd, drive_ch, steer, args.drive_speed)
+                last_cmd = cmd
                 now = time.monotonic()
-                print(format_cmd_log(cmd, now - last_print))
+                log.info(format_cmd_log(cmd, now - last_print))
                 last_print = now
                 dt = time.time() - t0
                 if dt < period:
                     time.sleep(period - dt)
 
         else:
-            def frame_provider():
-                return capture_jpeg_bytes(cam)
+            # No PrevFrameCache here: replies arrive asynchronously and cannot be
+            # paired with the frame that produced them.
+            frame_provider = grab_jpeg
 
             last_print = time.monotonic()
-            def on_command(cmd: Command):
-                nonlocal last_print
-                apply_cmd(cmd, drive_ch, steer, args.drive_speed)
+            last_cmd = None
+            async def on_command(cmd: Command):
+                nonlocal last_print, last_cmd
+                if not is_idle_repeat(cmd, last_cmd):
+                    await apply_cmd_async(cmd, drive_ch, steer, args.drive_speed)
+                last_cmd = cmd
                 now = time.monotonic()
-                print(format_cmd_log(cmd, now - last_print))
+                log.info(format_cmd_log(cmd, now - last_print))
                 last_print = now
 
+            try:
+                # Faster event loop for the WebSocket receive path, if installed.
+                import uvloop
+                uvloop.install()
+            except ImportError:
+                pass
+
             asyncio.run(run_live_loop(
                 model=args.model,
                 frame_provider=frame_provider,
                 on_command=on_command,
                 loop_delay_s=period,
+                send_audio="native-audio" in args.model,
             ))
 
     finally:
@@ -150,7 +266,11 @@ def main():
         drive_ch.stop()
         steer.center()
         steer_ch.stop()
-        cam.stop()
+        if hw_source is not None:
+            hw_source.stop()
+        else:
+            cam.stop()
+        log_listener.stop()  # flush queued log lines
 
 if __name__ == "__main__":
     main()